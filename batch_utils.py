@@ -0,0 +1,120 @@
+import gc
+import json
+import os
+import torch
+
+class BatchOutOfMemoryError(RuntimeError):
+    """
+    Raised when part of a batch cannot fit in memory, even one image at a time.
+
+    The images that were generated before the error are kept in images, in batch order.
+    """
+
+    def __init__(self, images):
+        super().__init__(
+            f"Out of memory while generating a single image ({len(images)} images of the batch finished)"
+        )
+        self.images = images
+
+def parse_batch_size(value):
+    """Parse a batch size as a positive integer or 'auto'. Raises a ValueError otherwise."""
+    if value == "auto":
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"invalid batch size '{value}', expected a positive integer or 'auto'")
+    try:
+        batch_size = int(value)
+    except ValueError:
+        raise ValueError(f"invalid batch size '{value}', expected a positive integer or 'auto'") from None
+    if batch_size < 1:
+        raise ValueError(f"batch size must be at least 1, got {batch_size}")
+    return batch_size
+
+def is_oom_error(error):
+    """Check whether an exception is an out-of-memory error from CUDA or MPS."""
+    if isinstance(error, getattr(torch.cuda, "OutOfMemoryError", ())):
+        return True
+    return isinstance(error, RuntimeError) and "out of memory" in str(error).lower()
+
+def free_device_memory():
+    """Release cached allocator memory after an out-of-memory error."""
+    gc.collect()
+    if torch.backends.mps.is_available():
+        torch.mps.empty_cache()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+def split_batch_kwargs(kwargs, batch_size, start, end):
+    """Slice every per-image argument (lists and tensors of length batch_size) to [start:end]."""
+    split = {}
+    for key, value in kwargs.items():
+        if isinstance(value, list) and len(value) == batch_size:
+            split[key] = value[start:end]
+        elif isinstance(value, torch.Tensor) and value.dim() > 0 and value.shape[0] == batch_size:
+            split[key] = value[start:end]
+        else:
+            split[key] = value
+    return split
+
+class AdaptiveBatchSizer:
+    """
+    Learns the largest batch size that fits in memory for one generation shape.
+
+    The limits are stored in a JSON file keyed by shape, so later runs start
+    from what earlier runs learned instead of probing again.
+    """
+
+    def __init__(self, shape_key, limits_file="batch_limits.json"):
+        self.shape_key = shape_key
+        self.limits_file = limits_file
+        entry = self._load_limits().get(shape_key, {})
+        self.max_ok = entry.get("max_ok", 0)
+        self.min_fail = entry.get("min_fail")
+
+    def next_batch_size(self, remaining):
+        """Pick the batch size for the next call, given the number of images left."""
+        if self.max_ok == 0:
+            size = 1 if self.min_fail is None else max(1, self.min_fail // 2)
+        elif self.min_fail is None:
+            # No failure seen yet, keep doubling until we find the limit
+            size = self.max_ok * 2
+        elif self.min_fail - self.max_ok > 1:
+            # Narrow down the gap between the known good and bad sizes
+            size = (self.max_ok + self.min_fail) // 2
+        else:
+            size = self.max_ok
+        return max(1, min(size, remaining))
+
+    def record_success(self, batch_size):
+        if batch_size <= self.max_ok:
+            return
+        self.max_ok = batch_size
+        if self.min_fail is not None and self.min_fail <= batch_size:
+            self.min_fail = None
+        self._save()
+
+    def record_oom(self, batch_size):
+        if self.min_fail is not None and batch_size >= self.min_fail:
+            return
+        self.min_fail = batch_size
+        self.max_ok = min(self.max_ok, batch_size - 1)
+        self._save()
+
+    def _load_limits(self):
+        if not os.path.isfile(self.limits_file):
+            return {}
+        try:
+            with open(self.limits_file, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Ignoring unreadable batch limits file: {e}")
+            return {}
+
+    def _save(self):
+        limits = self._load_limits()
+        limits[self.shape_key] = {"max_ok": self.max_ok, "min_fail": self.min_fail}
+        try:
+            with open(self.limits_file, 'w') as f:
+                json.dump(limits, f, indent=2, sort_keys=True)
+        except IOError as e:
+            print(f"Error saving batch limits: {e}")
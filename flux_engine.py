@@ -0,0 +1,180 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Callable, List, Optional, Union
+from PIL import Image
+from flux_utils import check_rendition_paths, encode_rendition, generate_sha256, parse_rendition, save_renditions
+from batch_utils import parse_batch_size
+from pipelines import PIPELINES, create_pipeline
+
+@dataclass
+class GenerationRequest:
+    """
+    Parameters for one generation run.
+
+    Model settings left as None take their defaults from the model's section in config.yaml.
+    """
+    prompt: str
+    mode: str = "text2img"
+    model: str = "schnell"
+    num_images: int = 1
+    batch_size: Union[int, str] = 1
+    guidance_scale: Optional[float] = None
+    height: Optional[int] = None
+    width: Optional[int] = None
+    num_inference_steps: Optional[int] = None
+    strength: Optional[float] = None
+    input_image: Optional[Union[str, Image.Image]] = None
+    randomness: bool = False
+
+@dataclass
+class GeneratedImage:
+    """A generated image kept in memory, with the prompt and settings that produced it."""
+    image: Image.Image
+    prompt: str
+    index: int
+    execution_time: float
+    request: GenerationRequest
+
+    @property
+    def sha256(self):
+        return generate_sha256(self.image)
+
+    def to_bytes(self, output_format="png", quality=None, max_dimension=None):
+        """Encode the image, f.example for an HTTP response, without writing it to disk."""
+        rendition = parse_rendition(
+            {"format": output_format, "quality": quality, "max_dimension": max_dimension}
+        )
+        buffer = io.BytesIO()
+        encode_rendition(self.image, buffer, rendition)
+        return buffer.getvalue()
+
+class FileSink:
+    """Optional sink that writes every generated image to disk in the configured renditions."""
+
+    def __init__(self, output_dir, renditions=None, base_filename=None):
+        self.output_dir = output_dir
+        self.renditions = [parse_rendition(r) for r in renditions or ["webp"]]
+        check_rendition_paths(self.renditions)
+        self.base_filename = base_filename
+        self.created_files = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def __call__(self, result):
+        if self.base_filename:
+            filename = f"{self.base_filename}_{result.index + 1}"
+        else:
+            filename = result.sha256
+        saved = save_renditions(result.image, os.path.join(self.output_dir, filename), self.renditions)
+        self.created_files.extend(rendition[0] for rendition in saved if rendition)
+
+class FluxEngine:
+    """
+    In-process API for generating images without going through run_flux.py.
+
+    Pipelines are loaded on first use and kept for later requests. All model work
+    runs on a single worker thread, so generate_stream never blocks the event loop
+    and pipelines are never used from two threads at once.
+    """
+
+    def __init__(self, config=None):
+        if config is None:
+            from run_flux import load_config
+            config = load_config()
+        self.config = config
+        self._pipelines = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="flux-engine")
+
+    def resolve_request(self, request):
+        """
+        Validate a request and fill in the model settings that were left as None from the config.
+
+        Raises:
+            ValueError: The request is invalid.
+        """
+        if (request.model, request.mode) not in PIPELINES:
+            raise ValueError(f"The combination of model '{request.model}' and mode '{request.mode}' is not supported.")
+        if request.mode in ["img2img", "upscale"] and request.input_image is None:
+            raise ValueError("An input_image is required when using img2img or upscale mode")
+
+        if isinstance(request.num_images, bool) or not isinstance(request.num_images, int) or request.num_images < 1:
+            raise ValueError(f"num_images must be a positive integer, got {request.num_images!r}")
+        # Same rule as --batch_size on the command line: a positive integer or "auto"
+        batch_size = parse_batch_size(request.batch_size)
+
+        model_config = self.config[request.model]
+        defaults = {
+            name: model_config[name]
+            for name in ["guidance_scale", "height", "width", "num_inference_steps", "strength"]
+            if getattr(request, name) is None
+        }
+        return replace(request, batch_size=batch_size, **defaults)
+
+    def generate(self, request: GenerationRequest, sink: Optional[Callable] = None) -> List[GeneratedImage]:
+        """
+        Generate all images for a request and return them in memory.
+
+        Args:
+            request: The generation parameters.
+            sink: Optional callable, f.example a FileSink, called with each GeneratedImage.
+        """
+        request = self.resolve_request(request)
+        return self._executor.submit(self._generate_all, request, sink).result()
+
+    async def generate_stream(self, request: GenerationRequest, sink: Optional[Callable] = None):
+        """
+        Async variant of generate that yields the images of each batch as soon as it finishes.
+
+        Usage:
+            async for result in engine.generate_stream(GenerationRequest("a viking")):
+                ...
+        """
+        request = self.resolve_request(request)
+        loop = asyncio.get_running_loop()
+        batches = await loop.run_in_executor(self._executor, self._start, request)
+        try:
+            while True:
+                results = await loop.run_in_executor(self._executor, self._next_batch, request, batches, sink)
+                if results is None:
+                    break
+                for result in results:
+                    yield result
+        finally:
+            await loop.run_in_executor(self._executor, batches.close)
+
+    def close(self):
+        """Stop the worker thread. Loaded pipelines are released with the engine."""
+        self._executor.shutdown(wait=True)
+
+    def _pipeline(self, model, mode):
+        if (model, mode) not in self._pipelines:
+            self._pipelines[(model, mode)] = create_pipeline(self.config, model, mode)
+        return self._pipelines[(model, mode)]
+
+    def _start(self, request):
+        return self._pipeline(request.model, request.mode).generate_batches(request, self.config)
+
+    def _next_batch(self, request, batches, sink):
+        batch = next(batches, None)
+        if batch is None:
+            return None
+        batch_start, images, prompts, execution_time = batch
+        results = [
+            GeneratedImage(image, prompts[i], batch_start + i, execution_time, request)
+            for i, image in enumerate(images)
+        ]
+        if sink:
+            for result in results:
+                sink(result)
+        return results
+
+    def _generate_all(self, request, sink):
+        batches = self._start(request)
+        results = []
+        while True:
+            batch_results = self._next_batch(request, batches, sink)
+            if batch_results is None:
+                return results
+            results.extend(batch_results)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+import yaml
+from model_store import (
+    model_entries,
+    snapshot_dir,
+    is_pinned_revision,
+    read_manifest,
+    pull_model,
+    verify_model,
+)
+
+def load_config():
+    with open('config.yaml', 'r') as f:
+        return yaml.safe_load(f)
+
+def select_entries(parser, entries, names):
+    if not names:
+        return entries
+    unknown = [name for name in names if name not in entries]
+    if unknown:
+        parser.error(f"Unknown model(s) {', '.join(unknown)}, choose from: {', '.join(entries)}")
+    return {name: entries[name] for name in names}
+
+def directory_size(path):
+    total = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+def main():
+    config = load_config()
+    store_dir = config.get('model_store_dir', 'models')
+    entries = model_entries(config)
+
+    parser = argparse.ArgumentParser(description="Manage the local Flux model store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in [
+        ("pull", "Download the pinned snapshots into the model store"),
+        ("verify", "Check the pulled snapshots against their checksums"),
+    ]:
+        subparser = subparsers.add_parser(command, help=help_text)
+        subparser.add_argument(
+            "names",
+            nargs="*",
+            help=f"Models to {command} (default: all of {', '.join(entries)})",
+        )
+    subparsers.add_parser("list", help="Show the pinned models and their status")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, (repo_id, revision) in entries.items():
+            if not is_pinned_revision(revision):
+                print(f"{name:<14} {repo_id}@{revision}  not pinned, set a commit SHA in config.yaml")
+                continue
+            path = snapshot_dir(store_dir, repo_id, revision)
+            manifest = read_manifest(path)
+            if manifest is None:
+                status = "not pulled"
+            else:
+                size = directory_size(path) / 1024 ** 3
+                status = f"pulled, {size:.1f} GB, verified {manifest['verified_at']}"
+            print(f"{name:<14} {repo_id}@{revision}  {status}")
+
+    elif args.command == "pull":
+        failed = False
+        for name, (repo_id, revision) in select_entries(parser, entries, args.names).items():
+            try:
+                path = pull_model(store_dir, repo_id, revision)
+            except ValueError as e:
+                failed = True
+                print(f"{name}: FAILED, {e}")
+                continue
+            print(f"Pulled {name}: {path}")
+        if failed:
+            sys.exit(1)
+
+    elif args.command == "verify":
+        failed = False
+        for name, (repo_id, revision) in select_entries(parser, entries, args.names).items():
+            problems = verify_model(store_dir, repo_id, revision)
+            if problems:
+                failed = True
+                print(f"{name}: FAILED")
+                for problem in problems:
+                    print(f"  {problem}")
+            else:
+                print(f"{name}: OK")
+        if failed:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
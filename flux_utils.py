@@ -3,8 +3,13 @@ import subprocess
 import hashlib
 from PIL import Image
 from term_image.image import AutoImage
-import io
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Map output format names to the format names used by Pillow
+PIL_FORMATS = {"webp": "WEBP", "png": "PNG", "jpg": "JPEG", "jpeg": "JPEG"}
+
+_encoder_pool = None
 
 def set_tokenizer_parallelism(enable_parallelism):
     os.environ["TOKENIZERS_PARALLELISM"] = "true" if enable_parallelism else "false"
@@ -23,7 +28,104 @@ def open_image(filename):
         os.startfile(filename)
 
 def generate_sha256(image):
-    """Generate SHA256 hash for the image."""
-    img_byte_arr = io.BytesIO()
-    image.save(img_byte_arr, format='PNG')
-    return hashlib.sha256(img_byte_arr.getvalue()).hexdigest()
+    """Generate SHA256 hash for the image from its raw pixels, without encoding it."""
+    sha256 = hashlib.sha256(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    sha256.update(image.tobytes())
+    return sha256.hexdigest()
+
+def parse_rendition(spec):
+    """
+    Parse a rendition from a "FORMAT[:QUALITY[:MAX_DIMENSION]]" string or a config dictionary.
+
+    Returns:
+        Dictionary with format, quality and max_dimension (None when not set).
+    """
+    if isinstance(spec, str):
+        parts = spec.split(":")
+        if len(parts) > 3:
+            raise ValueError(f"Invalid rendition '{spec}', expected FORMAT[:QUALITY[:MAX_DIMENSION]]")
+        parts += [""] * (3 - len(parts))
+        spec = {"format": parts[0], "quality": parts[1] or None, "max_dimension": parts[2] or None}
+
+    output_format = str(spec.get("format", "")).lower()
+    if output_format not in PIL_FORMATS:
+        raise ValueError(f"Invalid rendition format '{output_format}', choose from: {', '.join(PIL_FORMATS)}")
+    quality = spec.get("quality")
+    max_dimension = spec.get("max_dimension")
+    quality = int(quality) if quality is not None else None
+    max_dimension = int(max_dimension) if max_dimension is not None else None
+    if quality is not None and not 1 <= quality <= 100:
+        raise ValueError(f"Rendition quality must be between 1 and 100, got {quality}")
+    if max_dimension is not None and max_dimension < 1:
+        raise ValueError(f"Rendition max_dimension must be at least 1, got {max_dimension}")
+    return {"format": output_format, "quality": quality, "max_dimension": max_dimension}
+
+def get_encoder_pool():
+    """Return the shared thread pool used to encode renditions."""
+    global _encoder_pool
+    if _encoder_pool is None:
+        # Pillow releases the GIL while resizing and encoding, so threads run in parallel
+        _encoder_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
+    return _encoder_pool
+
+def rendition_path(base_path, rendition):
+    """Build the file path for a rendition, adding the max dimension for resized renditions."""
+    if rendition["max_dimension"]:
+        return f"{base_path}_{rendition['max_dimension']}px.{rendition['format']}"
+    return f"{base_path}.{rendition['format']}"
+
+def check_rendition_paths(renditions):
+    """Raise a ValueError if two renditions would be written to the same file."""
+    seen = {}
+    for rendition in renditions:
+        path = rendition_path("<name>", rendition)
+        if path in seen:
+            raise ValueError(
+                f"Renditions {seen[path]} and {rendition} would both be written to {path}, "
+                f"give them a different format or max_dimension"
+            )
+        seen[path] = rendition
+
+def encode_rendition(image, path, rendition):
+    """Resize and save a single rendition to a path or file object. Returns the rendered image."""
+    max_dimension = rendition["max_dimension"]
+    if max_dimension and max(image.size) > max_dimension:
+        image = image.copy()
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    pil_format = PIL_FORMATS[rendition["format"]]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+
+    options = {}
+    if rendition["quality"] is not None:
+        options["quality"] = rendition["quality"]
+    image.save(path, format=pil_format, **options)
+    return image
+
+def save_renditions(image, base_path, renditions):
+    """
+    Encode all renditions of an image in parallel.
+
+    Args:
+        image: The full-size PIL image.
+        base_path: Output path without extension.
+        renditions: List of renditions from parse_rendition.
+
+    Returns:
+        List of (path, rendered image) tuples in rendition order, None for renditions that failed.
+    """
+    pool = get_encoder_pool()
+    futures = []
+    for rendition in renditions:
+        path = rendition_path(base_path, rendition)
+        futures.append((path, pool.submit(encode_rendition, image, path, rendition)))
+
+    saved = []
+    for path, future in futures:
+        try:
+            saved.append((path, future.result()))
+        except (IOError, ValueError) as e:
+            print(f"Error saving image {path}: {e}")
+            saved.append(None)
+    return saved
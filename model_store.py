@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+MANIFEST_FILE = "manifest.json"
+
+def model_entries(config):
+    """
+    List the pinned models in the config.
+
+    Returns:
+        Dictionary mapping entry names to (repo_id, revision) tuples.
+    """
+    entries = {}
+    for name in ("schnell", "dev"):
+        model_config = config.get(name) or {}
+        if 'model_id' in model_config:
+            entries[name] = (model_config['model_id'], model_config['revision'])
+        if 'upscaler_model_id' in model_config:
+            entries[f"{name}-upscaler"] = (
+                model_config['upscaler_model_id'],
+                model_config.get('upscaler_revision'),
+            )
+    return entries
+
+def is_pinned_revision(revision):
+    """Check that a revision is a full commit SHA, not a branch or tag that can move."""
+    return isinstance(revision, str) and re.fullmatch(r"[0-9a-f]{40}", revision) is not None
+
+def require_pinned_revision(repo_id, revision):
+    if not is_pinned_revision(revision):
+        raise ValueError(
+            f"{repo_id} is not pinned to a commit SHA (revision: {revision}), "
+            f"set it in config.yaml from the output of print_revision.py"
+        )
+
+def snapshot_dir(store_dir, repo_id, revision):
+    return os.path.join(store_dir, repo_id.replace("/", "--"), revision)
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def read_manifest(path):
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def write_manifest(path, manifest):
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def pull_model(store_dir, repo_id, revision):
+    """
+    Download a pinned snapshot into the store and check it against the hub's checksums.
+
+    Root-level single-file checkpoints are skipped for diffusers pipeline repos,
+    since the pipeline loads the per-component weights in the subfolders.
+
+    Returns:
+        Path to the snapshot.
+    """
+    from huggingface_hub import HfApi, snapshot_download
+
+    require_pinned_revision(repo_id, revision)
+    info = HfApi().model_info(repo_id, revision=revision, files_metadata=True)
+    filenames = [s.rfilename for s in info.siblings]
+    if "model_index.json" in filenames:
+        filenames = [n for n in filenames if "/" in n or not n.endswith(".safetensors")]
+
+    path = snapshot_dir(store_dir, repo_id, revision)
+    print(f"Pulling {repo_id}@{revision} into {path}...")
+    snapshot_download(repo_id, revision=info.sha, local_dir=path, allow_patterns=filenames)
+
+    files = {}
+    for sibling in info.siblings:
+        if sibling.rfilename not in filenames:
+            continue
+        file_path = os.path.join(path, sibling.rfilename)
+        digest = file_sha256(file_path)
+        if sibling.lfs is not None and sibling.lfs.sha256 != digest:
+            raise ValueError(f"Checksum mismatch for {sibling.rfilename} in {repo_id}@{revision}")
+        files[sibling.rfilename] = {"size": os.path.getsize(file_path), "sha256": digest}
+
+    write_manifest(path, {
+        "repo_id": repo_id,
+        "revision": revision,
+        "commit": info.sha,
+        "files": files,
+        "verified_at": datetime.now().isoformat(),
+    })
+    return path
+
+def verify_model(store_dir, repo_id, revision):
+    """
+    Re-hash every file of a pulled snapshot and compare it to the manifest.
+
+    Returns:
+        List of problems, empty when the snapshot is intact.
+    """
+    if not is_pinned_revision(revision):
+        return ["not pinned to a commit SHA"]
+    path = snapshot_dir(store_dir, repo_id, revision)
+    manifest = read_manifest(path)
+    if manifest is None:
+        return ["not pulled"]
+
+    problems = []
+    for filename, expected in sorted(manifest['files'].items()):
+        file_path = os.path.join(path, filename)
+        if not os.path.isfile(file_path):
+            problems.append(f"missing {filename}")
+        elif os.path.getsize(file_path) != expected['size']:
+            problems.append(f"size mismatch for {filename}")
+        elif file_sha256(file_path) != expected['sha256']:
+            problems.append(f"checksum mismatch for {filename}")
+
+    if not problems:
+        manifest['verified_at'] = datetime.now().isoformat()
+        write_manifest(path, manifest)
+    return problems
+
+def local_model_path(store_dir, repo_id, revision):
+    """
+    Return the snapshot path if the model is in the store, otherwise None.
+
+    Only file sizes are checked here, full checksums are checked by pull and verify.
+    """
+    if not store_dir:
+        return None
+    path = snapshot_dir(store_dir, repo_id, revision)
+    manifest = read_manifest(path)
+    if manifest is None:
+        return None
+    for filename, expected in manifest['files'].items():
+        file_path = os.path.join(path, filename)
+        if not os.path.isfile(file_path) or os.path.getsize(file_path) != expected['size']:
+            print(f"Local snapshot of {repo_id}@{revision} is incomplete, falling back to the hub.")
+            return None
+    return path
+
+def resolve_pretrained(store_dir, repo_id, revision):
+    """
+    Pick where from_pretrained should load a model from.
+
+    Returns:
+        Tuple of (path or repo id, extra from_pretrained keyword arguments).
+    """
+    if not is_pinned_revision(revision):
+        # Unpinned models cannot be in the store, load them from the hub as before
+        print(
+            f"Warning: {repo_id} is not pinned to a commit SHA (revision: {revision}), loading the "
+            f"latest version from the hub. Set it in config.yaml from the output of print_revision.py."
+        )
+        return repo_id, {"revision": revision} if revision else {}
+    path = local_model_path(store_dir, repo_id, revision)
+    if path:
+        # Load from the snapshot directory, so no network calls are made
+        return path, {"local_files_only": True, "use_safetensors": True}
+    return repo_id, {"revision": revision}
@@ -3,3 +3,27 @@ from .schnell_img2img import SchnellImg2ImgPipeline
 from .dev_text2img import DevText2ImgPipeline
 from .dev_img2img import DevImg2ImgPipeline
 from .dev_upscale import DevUpscalePipeline
+
+# Pipeline class for each supported (model, mode) combination
+PIPELINES = {
+    ("schnell", "text2img"): SchnellText2ImgPipeline,
+    ("schnell", "img2img"): SchnellImg2ImgPipeline,
+    ("dev", "text2img"): DevText2ImgPipeline,
+    ("dev", "img2img"): DevImg2ImgPipeline,
+    ("dev", "upscale"): DevUpscalePipeline,
+}
+
+def create_pipeline(config, model, mode):
+    """Create the pipeline for a model and mode, which loads the model (from the local model store when pulled)."""
+    pipeline_class = PIPELINES[(model, mode)]
+    model_config = config[model]
+    model_store_dir = config.get('model_store_dir', 'models')
+    if mode == "upscale":
+        return pipeline_class(
+            model_config['model_id'],
+            model_config['revision'],
+            model_config['upscaler_model_id'],
+            model_config.get('upscaler_revision'),
+            model_store_dir,
+        )
+    return pipeline_class(model_config['model_id'], model_config['revision'], model_store_dir)
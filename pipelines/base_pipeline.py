@@ -1,57 +1,322 @@
 from abc import ABC, abstractmethod
+import copy
 import os
+import time
 import torch
 import csv
 from datetime import datetime
 from diffusers import FluxPipeline, FluxImg2ImgPipeline
-from flux_utils import display_image_in_terminal, open_image, generate_sha256
+from diffusers.utils import load_image
+from model_store import resolve_pretrained
+from batch_utils import AdaptiveBatchSizer, BatchOutOfMemoryError, is_oom_error, free_device_memory, split_batch_kwargs
+from flux_utils import (
+    display_image_in_terminal,
+    open_image,
+    generate_sha256,
+    parse_rendition,
+    save_renditions,
+)
+from sweep_utils import (
+    expand_sweep_grid,
+    group_sweep_cells,
+    build_contact_sheet,
+    write_sweep_results,
+    print_sweep_results,
+)
 
 class BasePipeline(ABC):
-    def __init__(self, model_id, revision, model_type):
+    def __init__(self, model_id, revision, model_type, model_store_dir=None):
         self.model_id = model_id
         self.revision = revision
         self.model_type = model_type
+        self.model_store_dir = model_store_dir
         self.pipe = None
         self.log_file = "generation_log.csv"
+        self.batch_sizers = {}
         self.load_model()
 
     def load_model(self):
         print(f"Loading {self.model_type} model...")
+        start_time = time.time()
         pipeline_class = FluxPipeline if self.model_type == "text2img" else FluxImg2ImgPipeline
+        model_path, load_kwargs = resolve_pretrained(self.model_store_dir, self.model_id, self.revision)
         self.pipe = pipeline_class.from_pretrained(
-            self.model_id,
-            revision=self.revision,
+            model_path,
             torch_dtype=torch.bfloat16,  # Use bfloat16 for MPS
+            **load_kwargs,
         ).to("mps")  # Ensure the model is on the MPS device
-        print("Model loaded successfully.")
+        print(f"Model loaded successfully in {time.time() - start_time:.2f} seconds.")
 
     @abstractmethod
-    def generate_images(self, args, config):
+    def generate_batches(self, args, config):
         pass
 
+    def generate_images(self, args, config):
+        """
+        Generates images and saves each one as soon as its batch is done.
+
+        Args:
+            args: Command-line arguments containing prompt, num_images, output_dir, etc.
+            config: Configuration dictionary containing prompt variants.
+
+        Returns:
+            List of file paths to the generated images.
+        """
+        created_files = []
+        os.makedirs(args.output_dir, exist_ok=True)
+
+        for batch_start, images, prompts, execution_time in self.generate_batches(args, config):
+            # Save and display each image in the batch
+            for i, image in enumerate(images):
+                full_path = self.save_and_display_image(
+                    image, args, batch_start + i, execution_time, prompts[i]
+                )
+                if full_path:
+                    created_files.append(full_path)
+
+        print(f"\n{args.num_images} images have been generated and saved.")
+        return created_files
+
+    def next_batch_size(self, args, remaining, num_inference_steps=None):
+        """
+        Returns the size of the next batch, at most remaining.
+
+        With --batch_size auto the size is learned per generation shape.
+        """
+        batch_size = getattr(args, 'batch_size', 1)
+        if batch_size != "auto":
+            return min(batch_size, remaining)
+        return self._batch_sizer(args, num_inference_steps).next_batch_size(remaining)
+
+    def _batch_sizer(self, args, num_inference_steps=None):
+        steps = num_inference_steps or args.num_inference_steps
+        shape_key = (
+            f"{self.model_id}@{self.revision}|{self.model_type}|{args.width}x{args.height}"
+            f"|{steps} steps|{self.pipe.dtype}|{self.pipe.device}"
+        )
+        if shape_key not in self.batch_sizers:
+            self.batch_sizers[shape_key] = AdaptiveBatchSizer(shape_key)
+        return self.batch_sizers[shape_key]
+
+    def run_batch(self, args, batch_size, **kwargs):
+        """
+        Runs the pipeline on one batch, splitting it in half and retrying on out-of-memory errors.
+
+        Per-image arguments (lists and tensors of length batch_size) are split with the batch.
+
+        Returns:
+            List of generated images, in batch order.
+
+        Raises:
+            BatchOutOfMemoryError: A single image does not fit, with the images that finished before it.
+        """
+        sizer = None
+        if getattr(args, 'batch_size', 1) == "auto":
+            sizer = self._batch_sizer(args, kwargs.get("num_inference_steps"))
+
+        images = None
+        try:
+            images = self.pipe(**kwargs).images
+        except Exception as e:
+            if not is_oom_error(e):
+                raise
+
+        if images is None:
+            # Retry outside the except block so the failed batch's tensors can be freed
+            free_device_memory()
+            if sizer:
+                sizer.record_oom(batch_size)
+            if batch_size == 1:
+                raise BatchOutOfMemoryError([])
+            half = batch_size // 2
+            print(f"Out of memory with batch size {batch_size}, retrying as {half} + {batch_size - half}...")
+            first = self.run_batch(args, half, **split_batch_kwargs(kwargs, batch_size, 0, half))
+            try:
+                second = self.run_batch(
+                    args, batch_size - half, **split_batch_kwargs(kwargs, batch_size, half, batch_size)
+                )
+            except BatchOutOfMemoryError as e:
+                # Keep the first half's images so the caller can still save them
+                raise BatchOutOfMemoryError(first + e.images) from None
+            return first + second
+
+        if sizer:
+            sizer.record_success(batch_size)
+        return images
+
+    def run_sweep(self, args, axes):
+        """
+        Generates one image per combination of the swept parameters.
+
+        The prompt is encoded once and the initial noise for each seed is shared
+        across cells. Cells that only differ in seed are batched together.
+
+        Args:
+            args: Command-line arguments containing prompt, batch_size, etc.
+            axes: Dictionary mapping parameter names to the values to sweep.
+
+        Returns:
+            List of file paths to the generated images.
+        """
+        os.makedirs(args.output_dir, exist_ok=True)
+        cells = expand_sweep_grid(axes, args)
+        print(f"Sweeping {len(cells)} combinations of {', '.join(axes)}...")
+
+        # Encode the prompt once and reuse the embeddings for every cell
+        with torch.no_grad():
+            prompt_embeds, pooled_prompt_embeds, _ = self.pipe.encode_prompt(
+                prompt=args.prompt, prompt_2=None
+            )
+
+        device = self.pipe._execution_device
+        if self.model_type == "img2img":
+            init_image = load_image(args.input_image).convert("RGB").resize(
+                (args.width, args.height)
+            )
+        else:
+            # Draw the initial latents once per seed
+            num_channels_latents = self.pipe.transformer.config.in_channels // 4
+            latents_by_seed = {}
+            for seed in sorted({cell["seed"] for cell in cells}):
+                latents_by_seed[seed], _ = self.pipe.prepare_latents(
+                    1,
+                    num_channels_latents,
+                    args.height,
+                    args.width,
+                    prompt_embeds.dtype,
+                    device,
+                    torch.Generator("cpu").manual_seed(seed),
+                )
+
+        base = args.base_filename or "sweep"
+        renditions = self.output_renditions(args)
+        images = [None] * len(cells)
+        results = [None] * len(cells)
+        created_files = [None] * len(cells)
+
+        for group in group_sweep_cells(cells):
+            group_start = 0
+            while group_start < len(group):
+                n = self.next_batch_size(
+                    args, len(group) - group_start, group[0][1]["num_inference_steps"]
+                )
+                batch = group[group_start:group_start + n]
+                group_start += n
+                indices = [index for index, _ in batch]
+                batch_cells = [cell for _, cell in batch]
+                cell = batch_cells[0]
+                print(f"\nGenerating cells {', '.join(str(i + 1) for i in indices)}/{len(cells)}...")
+
+                kwargs = dict(
+                    prompt_embeds=prompt_embeds.repeat(n, 1, 1),
+                    pooled_prompt_embeds=pooled_prompt_embeds.repeat(n, 1),
+                    guidance_scale=cell["guidance_scale"],
+                    height=args.height,
+                    width=args.width,
+                    num_inference_steps=cell["num_inference_steps"],
+                )
+                if self.model_type == "img2img":
+                    # img2img noise depends on strength, so share seeded generators instead
+                    kwargs["image"] = [init_image] * n
+                    kwargs["strength"] = cell["strength"]
+                    kwargs["generator"] = [
+                        torch.Generator("cpu").manual_seed(c["seed"]) for c in batch_cells
+                    ]
+                else:
+                    kwargs["latents"] = torch.cat([latents_by_seed[c["seed"]] for c in batch_cells])
+
+                start_time = time.time()
+                oom_error = None
+                try:
+                    batch_images = self.run_batch(args, n, **kwargs)
+                except BatchOutOfMemoryError as e:
+                    # Save the cells that finished before the error, then re-raise
+                    batch_images, oom_error = e.images, e
+                execution_time = time.time() - start_time
+
+                for index, batch_cell, image in zip(indices, batch_cells, batch_images):
+                    base_path = os.path.join(args.output_dir, f"{base}_{index + 1}")
+                    saved = save_renditions(image, base_path, renditions)
+                    full_path = saved[0][0] if saved[0] else None
+                    images[index] = image
+                    created_files[index] = full_path
+
+                    # Log each cell with its own settings, if its primary output was written
+                    if full_path:
+                        cell_args = copy.copy(args)
+                        cell_args.guidance_scale = batch_cell["guidance_scale"]
+                        cell_args.strength = batch_cell["strength"]
+                        self.log_generation(
+                            generate_sha256(image), args.prompt, full_path, execution_time / n, cell_args
+                        )
+                    results[index] = {
+                        "Cell": index + 1,
+                        "GuidanceScale": batch_cell["guidance_scale"],
+                        "Steps": batch_cell["num_inference_steps"],
+                        "Strength": batch_cell["strength"] if self.model_type == "img2img" else 'N/A',
+                        "Seed": batch_cell["seed"],
+                        "ExecutionTime": f"{execution_time / n:.2f}",
+                        "OutputFile": full_path or 'N/A',
+                    }
+
+                print(f"Batch generation time: {execution_time:.2f} seconds")
+                if oom_error:
+                    raise oom_error
+
+        sheet_base_path = os.path.join(args.output_dir, f"{base}_sheet")
+        sheet = build_contact_sheet(images, cells, axes)
+        saved = save_renditions(sheet, sheet_base_path, renditions)
+        sheet_path = saved[0][0] if saved[0] else None
+        if sheet_path:
+            print(f"\nSaved contact sheet: {sheet_path}")
+
+        results_path = os.path.join(args.output_dir, f"{base}_results.csv")
+        write_sweep_results(results_path, results)
+        print(f"Saved results: {results_path}\n")
+        print_sweep_results(results)
+
+        if not getattr(args, 'headless', False):
+            print("\nContact sheet preview:")
+            display_image_in_terminal(sheet)
+
+            if args.view_image and sheet_path:
+                open_image(sheet_path)
+
+        return [full_path for full_path in created_files if full_path]
+
+    def output_renditions(self, args):
+        """Returns the renditions to write, the first one being the primary output file."""
+        # Without configured renditions, write a single full-size image in the output format
+        return getattr(args, 'renditions', None) or [parse_rendition({"format": args.output_format})]
+
     def save_and_display_image(self, image, args, index, execution_time, prompt):
         sha256_hash = generate_sha256(image)
-        output_format = args.output_format.lower()
         if hasattr(args, 'base_filename') and args.base_filename:
-            filename = f"{args.base_filename}_{index+1}.{output_format}"
+            filename = f"{args.base_filename}_{index+1}"
         else:
-            filename = f"{sha256_hash}.{output_format}"
+            filename = sha256_hash
 
-        full_path = os.path.join(args.output_dir, filename)
-        try:
-            image.save(full_path, format=output_format.upper())
-            print(f"Saved image: {full_path}")
-        except IOError as e:
-            print(f"Error saving image: {e}")
+        renditions = self.output_renditions(args)
+        saved = save_renditions(image, os.path.join(args.output_dir, filename), renditions)
+        for rendition in saved:
+            if rendition:
+                print(f"Saved image: {rendition[0]}")
+
+        # The first rendition is the primary output that gets logged and returned
+        full_path = saved[0][0] if saved[0] else None
 
-        print("\nImage preview:")
-        display_image_in_terminal(image)
+        if not getattr(args, 'headless', False):
+            rendered = [rendition[1] for rendition in saved if rendition]
+            if rendered:
+                print("\nImage preview:")
+                display_image_in_terminal(min(rendered, key=lambda r: r.size[0] * r.size[1]))
 
-        if args.view_image:
-            open_image(full_path)
+            if args.view_image and full_path:
+                open_image(full_path)
 
-        # Log the generation
-        self.log_generation(sha256_hash, prompt, full_path, execution_time, args)
+        # Only log images whose primary output was written
+        if full_path:
+            self.log_generation(sha256_hash, prompt, full_path, execution_time, args)
 
         return full_path
 
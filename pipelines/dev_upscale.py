@@ -1,43 +1,50 @@
 import time
-import os
 from .base_pipeline import BasePipeline
 from PIL import Image
 from diffusers.utils import load_image
 from diffusers import FluxControlNetModel
 from diffusers.pipelines import FluxControlNetPipeline
 import torch
+from model_store import resolve_pretrained
+from prompt_utils import generate_prompt_variant
 
 class DevUpscalePipeline(BasePipeline):
-    def __init__(self, model_id, revision):
-        super().__init__(model_id, revision, "upscale")
+    def __init__(self, model_id, revision, upscaler_model_id, upscaler_revision, model_store_dir=None):
+        self.upscaler_model_id = upscaler_model_id
+        self.upscaler_revision = upscaler_revision
+        super().__init__(model_id, revision, "upscale", model_store_dir)
 
     def load_model(self):
         print(f"Loading {self.model_type} model...")
+        start_time = time.time()
+        controlnet_path, controlnet_kwargs = resolve_pretrained(
+          self.model_store_dir, self.upscaler_model_id, self.upscaler_revision
+        )
         controlnet = FluxControlNetModel.from_pretrained(
-          "jasperai/Flux.1-dev-Controlnet-Upscaler",
-          torch_dtype=torch.bfloat16
+          controlnet_path,
+          torch_dtype=torch.bfloat16,
+          **controlnet_kwargs
         )
+        model_path, load_kwargs = resolve_pretrained(self.model_store_dir, self.model_id, self.revision)
         self.pipe = FluxControlNetPipeline.from_pretrained(
-          "black-forest-labs/FLUX.1-dev",
+          model_path,
           controlnet=controlnet,
-          torch_dtype=torch.bfloat16
+          torch_dtype=torch.bfloat16,
+          **load_kwargs
         ).to("mps")
-        print("Model loaded successfully.")
+        print(f"Model loaded successfully in {time.time() - start_time:.2f} seconds.")
 
-    def generate_images(self, args, config):
+    def generate_batches(self, args, config):
         """
-        Upscales images using the Dev upscaler pipeline.
+        Upscales images in memory using the Dev upscaler pipeline, one image per batch.
 
         Args:
-            args: Command-line arguments containing input_image, etc.
+            args: Command-line arguments or a GenerationRequest containing input_image, etc.
             config: Configuration dictionary.
 
-        Returns:
-            List of file paths to the upscaled images.
+        Yields:
+            Tuples of (index of the image, [image], [prompt], execution time).
         """
-        created_files = []
-        os.makedirs(args.output_dir, exist_ok=True)
-
         # Load a control image
         control_image = load_image(args.input_image)
 
@@ -69,13 +76,5 @@ class DevUpscalePipeline(BasePipeline):
             end_time = time.time()
             execution_time = end_time - start_time
 
-            # Save and display the upscaled image
-            full_path = self.save_and_display_image(
-                image, args, i, execution_time, prompt
-            )
-            created_files.append(full_path)
-
             print(f"Upscaling time: {execution_time:.2f} seconds")
-
-        print(f"\n{args.num_images} images have been upscaled and saved.")
-        return created_files
+            yield i, [image], [prompt], execution_time
@@ -10,3 +10,7 @@ print(f"Latest revision: FLUX.1-schnell - {latest_revision}")
 info = api.repo_info("black-forest-labs/FLUX.1-dev")
 latest_revision = info.sha
 print(f"Latest revision: FLUX.1-dev     - {latest_revision}")
+
+info = api.repo_info("jasperai/Flux.1-dev-Controlnet-Upscaler")
+latest_revision = info.sha
+print(f"Latest revision: Flux.1-dev-Controlnet-Upscaler - {latest_revision}")
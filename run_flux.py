@@ -3,14 +3,11 @@
 import argparse
 import yaml
 import os
-from pipelines import (
-    SchnellText2ImgPipeline,
-    SchnellImg2ImgPipeline,
-    DevText2ImgPipeline,
-    DevImg2ImgPipeline,
-    DevUpscalePipeline,
-)
+from pipelines import PIPELINES, create_pipeline
 from prompt_utils import generate_prompt_variant
+from sweep_utils import parse_sweep, SWEEP_PARAMS
+from flux_utils import parse_rendition, check_rendition_paths
+from batch_utils import parse_batch_size
 import copy
 import sys
 
@@ -18,6 +15,13 @@ def load_config():
     with open('config.yaml', 'r') as f:
         return yaml.safe_load(f)
 
+def batch_size_type(value):
+    """Parse --batch_size as a positive integer or 'auto'."""
+    try:
+        return parse_batch_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
 def main():
     config = load_config()
 
@@ -125,9 +129,9 @@ def main():
     )
     parser.add_argument(
         "--batch_size",
-        type=int,
+        type=batch_size_type,
         default=1,
-        help="Batch size for image generation (default: 1)",
+        help="Batch size for image generation, or 'auto' to use the largest batch that fits in memory (default: 1)",
     )
 
     # Add model-specific arguments
@@ -181,6 +185,39 @@ def main():
         help=f"Output format for generated images (default: {config.get('output_format', 'webp')})",
     )
 
+    parser.add_argument(
+        "--rendition",
+        action="append",
+        dest="renditions",
+        default=None,
+        metavar="FORMAT[:QUALITY[:MAX_DIMENSION]]",
+        help="Write every image as this rendition, f.example webp:90 or jpg:80:512. Can be repeated. "
+             "Replaces the renditions in config.yaml, and the first one is the primary output file "
+             "that is logged and opened",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        default=config.get('headless', False),
+        help=f"Skip the terminal preview and image viewer (default: {config.get('headless', False)})",
+    )
+
+    # Parameter sweep arguments
+    parser.add_argument(
+        "--sweep",
+        action="append",
+        default=[],
+        metavar="NAME=VALUES",
+        help=f"Sweep a parameter over a list (a,b,c) or inclusive range (start:stop:step). "
+             f"Can be repeated to build a grid. Sweepable: {', '.join(SWEEP_PARAMS)}",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for the initial noise in sweeps, requires --sweep (default: 0)",
+    )
+
     # Now parse all arguments
     args = parser.parse_args()
 
@@ -188,28 +225,49 @@ def main():
     if args.mode in ["img2img", "upscale"] and not args.input_image:
         parser.error("The --input_image argument is required when using img2img or upscale mode")
 
-    # Create the appropriate pipeline
-    pipeline_class = {
-        ("schnell", "text2img"): SchnellText2ImgPipeline,
-        ("schnell", "img2img"): SchnellImg2ImgPipeline,
-        ("dev", "text2img"): DevText2ImgPipeline,
-        ("dev", "img2img"): DevImg2ImgPipeline,
-        ("dev", "upscale"): DevUpscalePipeline,  # Add this line
-    }.get((args.model, args.mode))
+    # Resolve the output renditions, the first one is the primary output file
+    try:
+        if args.renditions:
+            args.renditions = [parse_rendition(spec) for spec in args.renditions]
+        else:
+            args.renditions = [parse_rendition(spec) for spec in config.get('renditions') or []]
+        check_rendition_paths(args.renditions)
+    except ValueError as e:
+        parser.error(str(e))
 
-    if pipeline_class is None:
+    if (args.model, args.mode) not in PIPELINES:
         parser.error(f"The combination of model '{args.model}' and mode '{args.mode}' is not supported.")
 
-    # Update model_id for upscale mode
-    if args.mode == "upscale":
-        model_id = config[args.model]['upscaler_model_id']
-    else:
-        model_id = config[args.model]['model_id']
+    # Parse the sweep axes before loading the model
+    sweep_axes = {}
+    for spec in args.sweep:
+        try:
+            name, values = parse_sweep(spec)
+        except ValueError as e:
+            parser.error(str(e))
+        if name in sweep_axes:
+            parser.error(f"The parameter '{name}' is swept more than once, combine the values in one --sweep")
+        sweep_axes[name] = values
+    if sweep_axes and args.mode == "upscale":
+        parser.error("The --sweep argument is not supported in upscale mode")
+    if sweep_axes and args.randomness:
+        parser.error("The --sweep and --randomness arguments cannot be combined")
+    if "guidance_scale" in sweep_axes and args.model == "schnell":
+        parser.error("Sweeping guidance_scale is not supported with the schnell model, which ignores it")
+    if sweep_axes and "strength" in sweep_axes and args.mode != "img2img":
+        parser.error("Sweeping strength is only supported in img2img mode")
+    if args.seed is not None and not sweep_axes:
+        parser.error("The --seed argument is only supported together with --sweep")
+    if args.seed is None:
+        args.seed = 0
 
     # Create the pipeline (which loads the model)
-    pipeline = pipeline_class(
-        model_id, config[args.model]['revision']
-    )
+    pipeline = create_pipeline(config, args.model, args.mode)
+
+    if sweep_axes:
+        created_files = pipeline.run_sweep(args, sweep_axes)
+        print(f"\n{len(created_files)} sweep images have been generated and saved.")
+        return
 
     # Generate images using the pipeline
     pipeline.generate_images(args, config)
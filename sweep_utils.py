@@ -0,0 +1,132 @@
+import csv
+import itertools
+from PIL import Image, ImageDraw
+
+# Parameters that can be swept, and how to parse their values
+SWEEP_PARAMS = {
+    "guidance_scale": float,
+    "num_inference_steps": int,
+    "strength": float,
+    "seed": int,
+}
+
+def parse_sweep(spec):
+    """
+    Parse a sweep specification like "guidance_scale=1,2.5,4" or "num_inference_steps=10:50:10".
+
+    Ranges use start:stop:step and include the stop value.
+
+    Returns:
+        Tuple of (parameter name, list of values).
+    """
+    if "=" not in spec:
+        raise ValueError(f"Invalid sweep '{spec}', expected NAME=VALUES")
+    name, values = spec.split("=", 1)
+    name = name.strip()
+    if name not in SWEEP_PARAMS:
+        raise ValueError(f"Cannot sweep '{name}', choose from: {', '.join(SWEEP_PARAMS)}")
+    cast = SWEEP_PARAMS[name]
+
+    if ":" in values:
+        parts = values.split(":")
+        if len(parts) != 3:
+            raise ValueError(f"Invalid range '{values}', expected START:STOP:STEP")
+        start, stop, step = (cast(p) for p in parts)
+        if step <= 0:
+            raise ValueError(f"Range step must be positive, got {step}")
+        result = []
+        value = start
+        # Small tolerance so float ranges include their stop value
+        while value <= stop + step * 1e-6:
+            result.append(cast(round(value, 6)))
+            value += step
+    else:
+        result = [cast(v) for v in values.split(",") if v.strip()]
+
+    if not result:
+        raise ValueError(f"Sweep '{spec}' has no values")
+    for value in result:
+        if name == "num_inference_steps" and value < 1:
+            raise ValueError(f"num_inference_steps must be at least 1, got {value}")
+        if name == "strength" and not 0 < value <= 1:
+            raise ValueError(f"strength must be in (0, 1], got {value}")
+    return name, result
+
+def expand_sweep_grid(axes, args):
+    """
+    Expand sweep axes into a list of cells, one per parameter combination.
+
+    Parameters that are not swept take their value from args.
+    """
+    names = list(axes)
+    cells = []
+    for combo in itertools.product(*(axes[name] for name in names)):
+        cell = {
+            "guidance_scale": args.guidance_scale,
+            "num_inference_steps": args.num_inference_steps,
+            "strength": args.strength,
+            "seed": args.seed,
+        }
+        cell.update(zip(names, combo))
+        cells.append(cell)
+    return cells
+
+def group_sweep_cells(cells):
+    """
+    Group cells that can share a pipeline call.
+
+    Cells are compatible when they only differ in seed.
+
+    Returns:
+        List of groups, each a list of (cell index, cell) tuples.
+    """
+    groups = {}
+    for index, cell in enumerate(cells):
+        key = (cell["guidance_scale"], cell["num_inference_steps"], cell["strength"])
+        groups.setdefault(key, []).append((index, cell))
+    return list(groups.values())
+
+def build_contact_sheet(images, cells, axes, thumb_width=256):
+    """
+    Arrange sweep images in a labelled grid.
+
+    The last swept parameter runs along the columns, all others along the rows.
+    """
+    names = list(axes)
+    columns = len(axes[names[-1]]) if names else 1
+    rows = (len(images) + columns - 1) // columns
+
+    thumbs = []
+    for image in images:
+        thumb = image.copy()
+        thumb.thumbnail((thumb_width, thumb_width * 4))
+        thumbs.append(thumb)
+
+    label_height = 14 * max(1, len(names))
+    cell_width = thumb_width
+    cell_height = max(t.size[1] for t in thumbs) + label_height
+
+    sheet = Image.new("RGB", (columns * cell_width, rows * cell_height), "white")
+    draw = ImageDraw.Draw(sheet)
+    for i, (thumb, cell) in enumerate(zip(thumbs, cells)):
+        x = (i % columns) * cell_width
+        y = (i // columns) * cell_height
+        sheet.paste(thumb, (x, y))
+        label = "\n".join(f"{name}={cell[name]}" for name in names)
+        draw.multiline_text((x + 4, y + thumb.size[1] + 1), label, fill="black")
+    return sheet
+
+def write_sweep_results(path, rows):
+    """Write sweep results to a semicolon-delimited CSV file."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]), delimiter=';')
+        writer.writeheader()
+        writer.writerows(rows)
+
+def print_sweep_results(rows):
+    """Print sweep results as a plain text table."""
+    headers = list(rows[0])
+    widths = [max(len(str(h)), *(len(str(r[h])) for r in rows)) for h in headers]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(row[h]).ljust(w) for h, w in zip(headers, widths)))